@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Detect duplicate parent items in a Zotero library by normalized DOI and title.
+
+Modes:
+- dry-run only: scan and write logs; merging is left to Zotero's own
+  "Merge items" UI so relations, collections and tags are carried over.
+
+Performance:
+- DOI/title normalization runs once per item inside SQLite (registered
+  functions feeding a temp table); clusters come from indexed GROUP BY
+  queries instead of Python pairwise loops.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DOI_PREFIX_RE = re.compile(r"^https?://(dx\.)?doi\.org/", re.IGNORECASE)
+DOI_SCHEME_RE = re.compile(r"^doi:\s*", re.IGNORECASE)
+NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def now_stamp() -> str:
+    return dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+def connect_db(db_path: Path, writable: bool) -> sqlite3.Connection:
+    if writable:
+        con = sqlite3.connect(str(db_path), timeout=30)
+        con.execute("PRAGMA foreign_keys=ON")
+        return con
+    uri = f"file:{db_path.as_posix()}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True, timeout=30)
+
+
+def norm_doi(raw: Optional[str]) -> str:
+    # Same rules as normalizeDOI() in the JS scripts, plus case folding:
+    # DOIs are case-insensitive by spec.
+    if not raw:
+        return ""
+    d = DOI_PREFIX_RE.sub("", raw.strip())
+    d = DOI_SCHEME_RE.sub("", d)
+    return d.strip().lower()
+
+
+def norm_title(raw: Optional[str]) -> str:
+    # Same rules as normText() in the JS scripts.
+    if not raw:
+        return ""
+    return " ".join(NON_WORD_RE.sub(" ", raw.lower()).split())
+
+
+def register_functions(con: sqlite3.Connection) -> None:
+    con.create_function("norm_doi", 1, norm_doi, deterministic=True)
+    con.create_function("norm_title", 1, norm_title, deterministic=True)
+
+
+def build_key_table(con: sqlite3.Connection) -> int:
+    """Normalize DOI/title once per regular item into temp.parent_keys."""
+    # PDF annotations are items too (Zotero 6+); older schemas lack the table.
+    has_annotations = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itemAnnotations'"
+    ).fetchone()
+    annotation_filter = (
+        "AND i.itemID NOT IN (SELECT itemID FROM itemAnnotations)" if has_annotations else ""
+    )
+    con.execute("DROP TABLE IF EXISTS temp.parent_keys")
+    con.execute(
+        """
+        CREATE TEMP TABLE parent_keys (
+          itemID INTEGER PRIMARY KEY,
+          doi TEXT NOT NULL,
+          title TEXT NOT NULL
+        )
+        """
+    )
+    con.execute(
+        f"""
+        INSERT INTO temp.parent_keys (itemID, doi, title)
+        SELECT
+          i.itemID,
+          norm_doi(dv.value),
+          norm_title(tv.value)
+        FROM items i
+        LEFT JOIN itemData idd
+          ON idd.itemID = i.itemID
+         AND idd.fieldID = (SELECT fieldID FROM fields WHERE fieldName = 'DOI')
+        LEFT JOIN itemDataValues dv ON dv.valueID = idd.valueID
+        LEFT JOIN itemData idt ON idt.itemID = i.itemID AND idt.fieldID = 1
+        LEFT JOIN itemDataValues tv ON tv.valueID = idt.valueID
+        WHERE i.itemID NOT IN (SELECT itemID FROM itemAttachments)
+          AND i.itemID NOT IN (SELECT itemID FROM itemNotes)
+          AND i.itemID NOT IN (SELECT itemID FROM deletedItems)
+          {annotation_filter}
+        """
+    )
+    con.execute("CREATE INDEX temp.parent_keys_doi ON parent_keys (doi)")
+    con.execute("CREATE INDEX temp.parent_keys_title ON parent_keys (title)")
+    return con.execute("SELECT COUNT(*) FROM temp.parent_keys").fetchone()[0]
+
+
+def fetch_clusters(con: sqlite3.Connection, min_title_len: int) -> List[tuple]:
+    """
+    Return (clusterType, clusterKey, itemID) rows.
+
+    Each item lands in at most one cluster: items already in a DOI cluster
+    are left out of title clustering, so nothing is reported (or counted as a
+    merge candidate) twice. Title groups whose members carry two or more
+    different DOIs (preprint vs. published version, erratum) are not clusters.
+    """
+    sql = """
+    WITH doi_groups AS (
+      SELECT doi AS k
+      FROM temp.parent_keys
+      WHERE doi <> ''
+      GROUP BY doi
+      HAVING COUNT(*) > 1
+    ),
+    doi_members AS (
+      SELECT pk.doi AS k, pk.itemID
+      FROM doi_groups g JOIN temp.parent_keys pk ON pk.doi = g.k
+    ),
+    title_pool AS (
+      SELECT itemID, title, doi
+      FROM temp.parent_keys
+      WHERE length(title) >= :min_title_len
+        AND itemID NOT IN (SELECT itemID FROM doi_members)
+    ),
+    title_groups AS (
+      SELECT title AS k
+      FROM title_pool
+      GROUP BY title
+      HAVING COUNT(*) > 1
+         AND COUNT(DISTINCT NULLIF(doi, '')) <= 1
+    )
+    SELECT 'DOI', k, itemID
+    FROM doi_members
+    UNION ALL
+    SELECT 'TITLE', g.k, tp.itemID
+    FROM title_groups g JOIN title_pool tp ON tp.title = g.k
+    ORDER BY 1, 2, 3
+    """
+    return list(con.execute(sql, {"min_title_len": min_title_len}))
+
+
+def fetch_member_details(con: sqlite3.Connection, item_ids: List[int]) -> Dict[int, dict]:
+    if not item_ids:
+        return {}
+    con.execute("DROP TABLE IF EXISTS temp.cluster_members")
+    con.execute("CREATE TEMP TABLE cluster_members (itemID INTEGER PRIMARY KEY)")
+    con.executemany(
+        "INSERT OR IGNORE INTO temp.cluster_members (itemID) VALUES (?)",
+        ((x,) for x in item_ids),
+    )
+    sql = """
+    SELECT
+      i.itemID,
+      COALESCE(i.key, ''),
+      COALESCE(i.dateAdded, ''),
+      COALESCE(tv.value, ''),
+      COALESCE(dv.value, ''),
+      COALESCE(ac.attachments, 0),
+      COALESCE(ac.pdfs, 0),
+      COALESCE(nc.notes, 0)
+    FROM temp.cluster_members m
+    JOIN items i ON i.itemID = m.itemID
+    LEFT JOIN itemData idt ON idt.itemID = i.itemID AND idt.fieldID = 1
+    LEFT JOIN itemDataValues tv ON tv.valueID = idt.valueID
+    LEFT JOIN itemData idd
+      ON idd.itemID = i.itemID
+     AND idd.fieldID = (SELECT fieldID FROM fields WHERE fieldName = 'DOI')
+    LEFT JOIN itemDataValues dv ON dv.valueID = idd.valueID
+    LEFT JOIN (
+      SELECT
+        ia.parentItemID,
+        COUNT(*) AS attachments,
+        SUM(lower(COALESCE(ia.contentType, '')) = 'application/pdf') AS pdfs
+      FROM itemAttachments ia
+      JOIN temp.cluster_members m2 ON m2.itemID = ia.parentItemID
+      GROUP BY ia.parentItemID
+    ) ac ON ac.parentItemID = i.itemID
+    LEFT JOIN (
+      SELECT n.parentItemID, COUNT(*) AS notes
+      FROM itemNotes n
+      JOIN temp.cluster_members m3 ON m3.itemID = n.parentItemID
+      GROUP BY n.parentItemID
+    ) nc ON nc.parentItemID = i.itemID
+    """
+    out: Dict[int, dict] = {}
+    for item_id, key, date_added, title, raw_doi, atts, pdfs, notes in con.execute(sql):
+        out[item_id] = {
+            "itemKey": key,
+            "dateAdded": date_added,
+            "title": title,
+            "rawDOI": raw_doi,
+            "attachmentCount": atts,
+            "pdfCount": pdfs,
+            "noteCount": notes,
+        }
+    return out
+
+
+def analyze(clusters: List[tuple], details: Dict[int, dict]) -> tuple:
+    by_cluster: Dict[tuple, List[int]] = {}
+    for ctype, ckey, item_id in clusters:
+        by_cluster.setdefault((ctype, ckey), []).append(item_id)
+
+    rows: List[dict] = []
+    doi_clusters = 0
+    title_clusters = 0
+    for (ctype, ckey), members in by_cluster.items():
+        if ctype == "DOI":
+            doi_clusters += 1
+        else:
+            title_clusters += 1
+        # Suggest keeping the member with the most attached content, oldest first.
+        ranked = sorted(
+            members,
+            key=lambda x: (
+                -details[x]["attachmentCount"],
+                -details[x]["noteCount"],
+                details[x]["dateAdded"],
+                x,
+            ),
+        )
+        keep = ranked[0]
+        for item_id in ranked:
+            d = details[item_id]
+            rows.append(
+                {
+                    "clusterType": ctype,
+                    "clusterKey": ckey,
+                    "clusterSize": len(members),
+                    "itemID": item_id,
+                    "itemKey": d["itemKey"],
+                    "title": d["title"],
+                    "rawDOI": d["rawDOI"],
+                    "dateAdded": d["dateAdded"],
+                    "attachmentCount": d["attachmentCount"],
+                    "pdfCount": d["pdfCount"],
+                    "noteCount": d["noteCount"],
+                    "action": "KEEP_SUGGESTED" if item_id == keep else "MERGE_CANDIDATE",
+                    "reason": f"same normalized {ctype.lower()}; keep={keep}",
+                }
+            )
+
+    metrics = {
+        "doi_clusters": doi_clusters,
+        "title_clusters": title_clusters,
+        "cluster_member_rows": len(rows),
+        "merge_candidates": sum(1 for r in rows if r["action"] == "MERGE_CANDIDATE"),
+    }
+    return rows, metrics
+
+
+def write_csv(path: Path, rows: List[dict], headers: List[str]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=headers)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+
+def write_summary(
+    path: Path,
+    args: argparse.Namespace,
+    metrics: dict,
+    clusters_csv: Path,
+) -> None:
+    lines = [
+        "# Duplicate Parent Item Report",
+        "",
+        f"- Time: {dt.datetime.now().isoformat(timespec='seconds')}",
+        "- Mode: DRY_RUN",
+        f"- Database: `{args.db}`",
+        f"- Min normalized title length: `{args.min_title_len}`",
+        "",
+        "## Metrics",
+        "",
+        f"- Regular items scanned: `{metrics['items_total']}`",
+        f"- DOI clusters: `{metrics['doi_clusters']}`",
+        f"- Title clusters (not already covered by DOI): `{metrics['title_clusters']}`",
+        f"- Cluster member rows: `{metrics['cluster_member_rows']}`",
+        f"- Merge candidates: `{metrics['merge_candidates']}`",
+        f"- Elapsed seconds: `{metrics['elapsed_seconds']}`",
+        "",
+        "## Log Files",
+        "",
+        f"- Clusters: `{clusters_csv}`",
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Detect duplicate Zotero parent items by normalized DOI/title with logs."
+    )
+    p.add_argument("--db", default=r"E:\Zotero_database\zotero.sqlite", help="Path to zotero.sqlite")
+    p.add_argument(
+        "--log-dir", default=r"scripts\metadata-fixer\logs", help="Directory for logs"
+    )
+    p.add_argument(
+        "--min-title-len",
+        type=int,
+        default=20,
+        help="Ignore title clusters shorter than this after normalization",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    db_path = Path(args.db)
+    log_dir = Path(args.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = now_stamp()
+    clusters_csv = log_dir / f"parent_dedupe_clusters_{stamp}.csv"
+    summary_md = log_dir / f"parent_dedupe_summary_{stamp}.md"
+
+    started = dt.datetime.now()
+    con = connect_db(db_path, writable=False)
+    try:
+        register_functions(con)
+        items_total = build_key_table(con)
+        clusters = fetch_clusters(con, args.min_title_len)
+        details = fetch_member_details(con, [x[2] for x in clusters])
+    finally:
+        con.close()
+
+    rows, metrics = analyze(clusters, details)
+    metrics["items_total"] = items_total
+    metrics["elapsed_seconds"] = round((dt.datetime.now() - started).total_seconds(), 2)
+
+    write_csv(
+        clusters_csv,
+        rows,
+        [
+            "clusterType",
+            "clusterKey",
+            "clusterSize",
+            "itemID",
+            "itemKey",
+            "title",
+            "rawDOI",
+            "dateAdded",
+            "attachmentCount",
+            "pdfCount",
+            "noteCount",
+            "action",
+            "reason",
+        ],
+    )
+    write_summary(summary_md, args, metrics, clusters_csv)
+
+    print(f"summary={summary_md}")
+    print(f"clusters={clusters_csv}")
+    print(json.dumps(metrics, ensure_ascii=True))
+
+
+if __name__ == "__main__":
+    main()
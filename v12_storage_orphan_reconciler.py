@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Reconcile Zotero storage/<KEY> folders against the items table.
+
+Modes:
+- dry-run (default): scan and write logs only
+- apply: delete orphan storage folders and write a journal
+
+Method:
+- One scandir listing of storage keys and one SELECT of item keys; orphans
+  and missing folders are plain set differences.
+- Orphan = storage folder whose key has no items row at all.
+- Missing = stored attachment (path "storage:...") whose folder or file is gone.
+
+Safety:
+- Only orphan folders are ever deleted; item keys are re-read right before
+  deletion (honouring Zotero's lock) so items created mid-run are never
+  touched. If Zotero holds the lock or the re-read is empty, --apply is
+  refused with the reason in the summary; --force does not override this.
+- --apply is also refused when more than --max-orphan-share of storage
+  folders look orphaned, unless --force.
+- With --quarantine-dir, orphans are moved instead of deleted (to <KEY>.N if
+  <KEY> is already quarantined); moved bytes are not counted as reclaimed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import re
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+
+STORAGE_KEY_RE = re.compile(r"^[A-Z0-9]{8}$")
+
+
+def now_stamp() -> str:
+    return dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+def connect_db(db_path: Path, writable: bool) -> sqlite3.Connection:
+    if writable:
+        con = sqlite3.connect(str(db_path), timeout=30)
+        con.execute("PRAGMA foreign_keys=ON")
+        return con
+    uri = f"file:{db_path.as_posix()}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True, timeout=30)
+
+
+def connect_db_live(db_path: Path) -> sqlite3.Connection:
+    # Read-only but not immutable: honours locks and the WAL, so a busy Zotero
+    # makes the read fail instead of returning a stale snapshot.
+    uri = f"file:{db_path.as_posix()}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=30)
+
+
+def fetch_item_keys(db_path: Path) -> Set[str]:
+    con = connect_db_live(db_path)
+    try:
+        return {k for (k,) in con.execute("SELECT key FROM items") if k}
+    finally:
+        con.close()
+
+
+def apply_refusal(metrics: Dict[str, int], max_orphan_share: float) -> Optional[str]:
+    """Reason to refuse --apply when the scan looks like a wrong --db/--storage pair."""
+    if metrics["storage_folders"]:
+        share = metrics["orphan_folders"] / metrics["storage_folders"]
+        if share > max_orphan_share:
+            return (
+                f"{metrics['orphan_folders']}/{metrics['storage_folders']} storage folders "
+                f"({share:.0%}) look orphaned, above --max-orphan-share {max_orphan_share:.0%} "
+                "(use --force to override)"
+            )
+    return None
+
+
+def reread_item_keys(db_path: Path) -> Tuple[Set[str], Optional[str]]:
+    """Re-read live item keys for --apply; (keys, reason to refuse). Not overridable."""
+    try:
+        live_keys = fetch_item_keys(db_path)
+    except sqlite3.DatabaseError as e:
+        return set(), f"could not re-read item keys ({e}); close Zotero and retry"
+    if not live_keys:
+        return set(), "items table returned no keys"
+    return live_keys, None
+
+
+def fetch_stored_attachments(con: sqlite3.Connection) -> List[Tuple]:
+    sql = """
+    SELECT
+      ia.itemID,
+      COALESCE(i.key, '') AS attKey,
+      ia.parentItemID,
+      COALESCE(ia.path, '') AS attPath
+    FROM itemAttachments ia
+    JOIN items i ON i.itemID = ia.itemID
+    WHERE ia.path LIKE 'storage:%'
+    ORDER BY ia.itemID
+    """
+    return list(con.execute(sql))
+
+
+def scan_storage_keys(storage_dir: Path) -> Tuple[Set[str], int]:
+    """Return (key folder names, count of ignored non-key entries)."""
+    keys: Set[str] = set()
+    ignored = 0
+    with os.scandir(storage_dir) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False) and STORAGE_KEY_RE.match(entry.name):
+                keys.add(entry.name)
+            else:
+                ignored += 1
+    return keys, ignored
+
+
+def folder_size(folder: Path) -> Tuple[int, int]:
+    """Return (bytes, file count) for a folder tree without following symlinks."""
+    total = 0
+    files = 0
+    stack = [str(folder)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+                    files += 1
+    return total, files
+
+
+def analyze(
+    storage_dir: Path,
+    storage_keys: Set[str],
+    item_keys: Set[str],
+    stored_atts: List[Tuple],
+) -> Tuple[List[dict], List[dict], Dict[str, int]]:
+    orphan_rows: List[dict] = []
+    for key in sorted(storage_keys - item_keys):
+        size, files = folder_size(storage_dir / key)
+        orphan_rows.append(
+            {
+                "storageKey": key,
+                "folder": str(storage_dir / key),
+                "fileCount": files,
+                "sizeBytes": size,
+                "action": "DELETE_CANDIDATE",
+            }
+        )
+
+    att_keys = {att_key for _, att_key, _, _ in stored_atts}
+    missing_folders = att_keys - storage_keys
+    missing_rows: List[dict] = []
+    for att_item_id, att_key, parent_item_id, db_path in stored_atts:
+        if att_key in missing_folders:
+            kind = "MISSING_FOLDER"
+        else:
+            name = db_path[len("storage:") :]
+            if not name or (storage_dir / att_key / name).is_file():
+                continue
+            kind = "MISSING_FILE"
+        missing_rows.append(
+            {
+                "type": kind,
+                "attachmentItemID": att_item_id,
+                "attachmentKey": att_key,
+                "parentItemID": parent_item_id if parent_item_id is not None else "",
+                "attachmentDBPath": db_path,
+            }
+        )
+
+    metrics = {
+        "storage_folders": len(storage_keys),
+        "item_keys": len(item_keys),
+        "stored_attachments": len(stored_atts),
+        "orphan_folders": len(orphan_rows),
+        "orphan_files": sum(r["fileCount"] for r in orphan_rows),
+        "reclaimable_bytes": sum(r["sizeBytes"] for r in orphan_rows),
+        "missing_folders": sum(1 for r in missing_rows if r["type"] == "MISSING_FOLDER"),
+        "missing_files": sum(1 for r in missing_rows if r["type"] == "MISSING_FILE"),
+    }
+    return orphan_rows, missing_rows, metrics
+
+
+def write_csv(path: Path, rows: List[dict], headers: List[str]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=headers)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+
+def quarantine_destination(quarantine_dir: Path, key: str) -> Path:
+    """First free quarantine/<KEY>[.N] path; an earlier run may have left the same key."""
+    dest = quarantine_dir / key
+    n = 1
+    while os.path.lexists(dest):
+        dest = quarantine_dir / f"{key}.{n}"
+        n += 1
+    return dest
+
+
+JOURNAL_HEADERS = ["time", "storageKey", "folder", "sizeBytes", "storageDelete", "destination", "error"]
+
+
+def remove_orphans(
+    live_keys: Set[str],
+    storage_dir: Path,
+    orphan_rows: List[dict],
+    journal_path: Path,
+    quarantine_dir: Optional[Path],
+) -> Dict[str, int]:
+    # live_keys is re-read right before this call: anything Zotero created
+    # since the scan must survive.
+    if quarantine_dir:
+        quarantine_dir.mkdir(parents=True, exist_ok=True)
+    counts = {
+        "deleted": 0,
+        "moved": 0,
+        "skipped": 0,
+        "errors": 0,
+        "reclaimed_bytes": 0,
+        "moved_bytes": 0,
+    }
+    # Journal rows are flushed one by one so an interrupted run still leaves a record.
+    with journal_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=JOURNAL_HEADERS)
+        w.writeheader()
+        for r in orphan_rows:
+            key = r["storageKey"]
+            folder = storage_dir / key
+            entry = {
+                "time": dt.datetime.now().isoformat(timespec="seconds"),
+                "storageKey": key,
+                "folder": str(folder),
+                "sizeBytes": r["sizeBytes"],
+                "storageDelete": "",
+                "destination": "",
+                "error": "",
+            }
+            try:
+                if key in live_keys:
+                    entry["storageDelete"] = "SKIP_KEY_NOW_IN_DB"
+                    counts["skipped"] += 1
+                elif not folder.is_dir():
+                    entry["storageDelete"] = "SKIP_NOT_FOUND"
+                    counts["skipped"] += 1
+                elif quarantine_dir:
+                    dest = quarantine_destination(quarantine_dir, key)
+                    shutil.move(str(folder), str(dest))
+                    entry["storageDelete"] = "MOVED"
+                    entry["destination"] = str(dest)
+                    counts["moved"] += 1
+                    # Quarantined bytes still occupy disk; only deletions reclaim space.
+                    counts["moved_bytes"] += r["sizeBytes"]
+                else:
+                    shutil.rmtree(folder)
+                    entry["storageDelete"] = "DELETED"
+                    counts["deleted"] += 1
+                    counts["reclaimed_bytes"] += r["sizeBytes"]
+            except Exception as e:  # pragma: no cover
+                entry["storageDelete"] = "ERROR"
+                entry["error"] = str(e)
+                counts["errors"] += 1
+            w.writerow(entry)
+            f.flush()
+    return counts
+
+
+def write_summary(
+    path: Path,
+    args: argparse.Namespace,
+    metrics: Dict[str, int],
+    orphans_csv: Path,
+    missing_csv: Path,
+    journal_csv: Optional[Path],
+    apply_counts: Optional[Dict[str, int]],
+    refusal: Optional[str] = None,
+) -> None:
+    mib = metrics["reclaimable_bytes"] / (1024 * 1024)
+    lines = [
+        "# Storage Orphan Reconcile Report",
+        "",
+        f"- Time: {dt.datetime.now().isoformat(timespec='seconds')}",
+        f"- Mode: {'APPLY' if args.apply else 'DRY_RUN'}",
+        f"- Database: `{args.db}`",
+        f"- Storage: `{args.storage}`",
+        "",
+        "## Metrics",
+        "",
+        f"- Storage key folders: `{metrics['storage_folders']}`",
+        f"- Ignored non-key entries: `{metrics['ignored_entries']}`",
+        f"- Item keys in DB: `{metrics['item_keys']}`",
+        f"- Stored attachments: `{metrics['stored_attachments']}`",
+        f"- Orphan folders: `{metrics['orphan_folders']}` (`{metrics['orphan_files']}` files)",
+        f"- Reclaimable bytes: `{metrics['reclaimable_bytes']}` (~{mib:.1f} MiB)",
+        f"- Missing attachment folders: `{metrics['missing_folders']}`",
+        f"- Missing attachment files: `{metrics['missing_files']}`",
+    ]
+    if refusal:
+        lines.append(f"- Apply refused: {refusal}")
+    if apply_counts is not None:
+        lines += [
+            f"- Orphans deleted: `{apply_counts['deleted']}`",
+            f"- Orphans moved to quarantine: `{apply_counts['moved']}` (`{apply_counts['moved_bytes']}` bytes)",
+            f"- Orphans skipped: `{apply_counts['skipped']}`",
+            f"- Errors: `{apply_counts['errors']}`",
+            f"- Reclaimed bytes: `{apply_counts['reclaimed_bytes']}`",
+        ]
+    lines += [
+        "",
+        "## Log Files",
+        "",
+        f"- Orphans: `{orphans_csv}`",
+        f"- Missing: `{missing_csv}`",
+    ]
+    if journal_csv:
+        lines.append(f"- Journal: `{journal_csv}`")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Find orphan Zotero storage folders and missing attachment files with logs."
+    )
+    p.add_argument("--db", default=r"E:\Zotero_database\zotero.sqlite", help="Path to zotero.sqlite")
+    p.add_argument(
+        "--storage", default=r"E:\Zotero_database\storage", help="Path to Zotero storage directory"
+    )
+    p.add_argument(
+        "--log-dir", default=r"scripts\metadata-fixer\logs", help="Directory for logs"
+    )
+    p.add_argument("--apply", action="store_true", help="Remove orphan storage folders")
+    p.add_argument(
+        "--quarantine-dir",
+        default="",
+        help="With --apply, move orphan folders here instead of deleting them",
+    )
+    p.add_argument(
+        "--max-orphan-share",
+        type=float,
+        default=0.5,
+        help="Refuse --apply when more than this fraction of storage folders look orphaned",
+    )
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="With --apply, proceed even if orphans exceed --max-orphan-share",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    db_path = Path(args.db)
+    storage_dir = Path(args.storage)
+    log_dir = Path(args.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = now_stamp()
+    orphans_csv = log_dir / f"storage_reconcile_orphans_{stamp}.csv"
+    missing_csv = log_dir / f"storage_reconcile_missing_{stamp}.csv"
+    journal_csv = log_dir / f"storage_reconcile_journal_{stamp}.csv"
+    summary_md = log_dir / f"storage_reconcile_summary_{stamp}.md"
+
+    storage_keys, ignored = scan_storage_keys(storage_dir)
+    con = connect_db(db_path, writable=False)
+    try:
+        item_keys = {k for (k,) in con.execute("SELECT key FROM items") if k}
+        stored_atts = fetch_stored_attachments(con)
+    finally:
+        con.close()
+
+    orphan_rows, missing_rows, metrics = analyze(storage_dir, storage_keys, item_keys, stored_atts)
+    metrics["ignored_entries"] = ignored
+
+    write_csv(
+        orphans_csv,
+        orphan_rows,
+        ["storageKey", "folder", "fileCount", "sizeBytes", "action"],
+    )
+    write_csv(
+        missing_csv,
+        missing_rows,
+        ["type", "attachmentItemID", "attachmentKey", "parentItemID", "attachmentDBPath"],
+    )
+
+    journal_path: Optional[Path] = None
+    apply_counts: Optional[Dict[str, int]] = None
+    refusal: Optional[str] = None
+    if args.apply and not args.force:
+        refusal = apply_refusal(metrics, args.max_orphan_share)
+    if args.apply and not refusal:
+        # A locked or empty re-read always refuses; --force does not skip it.
+        live_keys, refusal = reread_item_keys(db_path)
+    if args.apply and not refusal:
+        quarantine = Path(args.quarantine_dir) if args.quarantine_dir else None
+        apply_counts = remove_orphans(live_keys, storage_dir, orphan_rows, journal_csv, quarantine)
+        journal_path = journal_csv
+
+    write_summary(
+        summary_md, args, metrics, orphans_csv, missing_csv, journal_path, apply_counts, refusal
+    )
+
+    print(f"summary={summary_md}")
+    print(f"orphans={orphans_csv}")
+    print(f"missing={missing_csv}")
+    if journal_path:
+        print(f"journal={journal_path}")
+    print(json.dumps(metrics, ensure_ascii=True))
+    if apply_counts is not None:
+        print(json.dumps(apply_counts, ensure_ascii=True))
+    if refusal:
+        raise SystemExit(f"refusing --apply: {refusal}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Ingest run logs from logs/ into a local SQLite metrics store and report on them.
+
+Modes:
+- default: ingest new bytes from every log, then write a report
+- --report-only: skip ingestion
+- --follow N: keep tailing the log directory every N seconds (Ctrl+C to stop)
+
+Inputs:
+- JS run logs `<LOG_PREFIX>_<stamp>.log`: `key=value` summary lines and
+  `details:`/`sample:` item lines. The `[vX][throttle|429|retry]` lines only go
+  to Zotero.debug, never to these logs, so 429s are counted from the
+  `provider_*` summary counters instead.
+- Python summaries `<name>_summary_<stamp>.md`: "- Label: `value`" metric lines.
+
+Incremental:
+- Byte offsets are stored per file; only complete new lines are parsed.
+  A file that shrinks is treated as rewritten and re-ingested from zero.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import json
+import math
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+LOG_NAME_RE = re.compile(
+    r"^(?P<prefix>.+?)_(?P<stamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.(?P<ext>log|md)$"
+)
+SECTION_RE = re.compile(r"^(?P<section>[A-Za-z0-9_]+):\s+(?P<rest>\S+=.*)$")
+PAIR_RE = re.compile(r"([A-Za-z0-9_]+)=([^,]*)")
+MD_METRIC_RE = re.compile(r"^- (?P<label>[^:]+):\s*`(?P<value>[^`]*)`")
+DURATION_RE = re.compile(r"^(?:(\d+)h)?\s*(?:(\d+)m)?\s*(?:(\d+)s)?$")
+ITEM_KEY_RE = re.compile(r"^[A-Z0-9]{8}$")
+NUM_RE = re.compile(r"^-?\d+(?:\.\d+)?%?$")
+DETAIL_HEADERS = ("details:", "sample:")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  path TEXT PRIMARY KEY,
+  prefix TEXT NOT NULL,
+  run_id INTEGER NOT NULL,
+  offset INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+  run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  path TEXT NOT NULL,
+  prefix TEXT NOT NULL,
+  stamp TEXT NOT NULL,
+  ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_metrics (
+  run_id INTEGER NOT NULL,
+  key TEXT NOT NULL,
+  num REAL,
+  text TEXT,
+  PRIMARY KEY (run_id, key)
+);
+CREATE TABLE IF NOT EXISTS run_items (
+  run_id INTEGER NOT NULL,
+  item_key TEXT NOT NULL,
+  outcome TEXT NOT NULL,
+  source TEXT NOT NULL,
+  detail TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_items_run ON run_items (run_id);
+"""
+
+
+def now_stamp() -> str:
+    return dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+def connect_store(path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(path), timeout=30)
+    con.executescript(SCHEMA)
+    return con
+
+
+def parse_duration(text: str) -> Optional[int]:
+    m = DURATION_RE.match(text.strip())
+    if not m or not any(m.groups()):
+        return None
+    h, mi, s = (int(x) if x else 0 for x in m.groups())
+    return h * 3600 + mi * 60 + s
+
+
+def to_metric(key: str, raw: str) -> Tuple[Optional[float], str]:
+    raw = raw.strip()
+    if NUM_RE.match(raw):
+        return float(raw.rstrip("%")), raw
+    if raw in ("true", "false"):
+        return (1.0 if raw == "true" else 0.0), raw
+    if key.endswith("elapsed") or key.startswith("est_"):
+        secs = parse_duration(raw)
+        if secs is not None:
+            return float(secs), raw
+    return None, raw
+
+
+def slug(label: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", label.strip().lower()).strip("_")
+
+
+def parse_log_line(line: str, state: str) -> Tuple[str, Optional[tuple]]:
+    """
+    Classify one log line; return (new state, record).
+
+    Records are ("metrics", [(key, num, text), ...]) or
+    ("item", key, outcome, source, detail).
+    """
+    line = line.rstrip("\r")
+    stripped = line.strip()
+    if stripped in DETAIL_HEADERS:
+        return "details", None
+    if stripped.startswith(DETAIL_HEADERS):
+        # v3 puts the first sample line on the header line itself.
+        stripped = stripped.split(":", 1)[1].strip()
+        state = "details"
+        if not stripped:
+            return state, None
+    if not stripped:
+        return state, None
+
+    if state == "details":
+        parts = [p.strip() for p in stripped.split(" | ")]
+        if parts[0] == "FAIL":
+            key = parts[1] if len(parts) > 1 and parts[1] != "?" else ""
+            return state, ("item", key, "fail", "", stripped)
+        if ITEM_KEY_RE.match(parts[0]):
+            second = parts[1] if len(parts) > 1 else ""
+            kv = dict(PAIR_RE.findall(second.replace(" ", ", ")))
+            if "=" in second or not second or ";" in second or "/" in second:
+                outcome = "ok"
+            else:
+                outcome = second
+            return state, ("item", parts[0], outcome, kv.get("abs", ""), stripped)
+        # v3 lines lead with the provider or review/nohit/fail outcome instead of a key.
+        return state, ("item", "", parts[0], parts[0], stripped)
+
+    m = SECTION_RE.match(stripped)
+    section = ""
+    rest = stripped
+    if m:
+        section, rest = m.group("section"), m.group("rest")
+    pairs = PAIR_RE.findall(rest)
+    if not pairs:
+        return state, None
+    # One line can hold many pairs; emit them as a batch.
+    return state, (
+        "metrics",
+        [
+            (f"{section}.{k}" if section else k, *to_metric(k, v))
+            for k, v in pairs
+        ],
+    )
+
+
+def parse_md_line(line: str) -> Optional[tuple]:
+    m = MD_METRIC_RE.match(line.strip())
+    if not m:
+        return None
+    key = slug(m.group("label"))
+    return ("metrics", [(key, *to_metric(key, m.group("value")))])
+
+
+def ensure_run(con: sqlite3.Connection, path: Path, prefix: str, stamp: str) -> Tuple[int, int, str]:
+    row = con.execute(
+        "SELECT run_id, offset, state FROM files WHERE path=?", (str(path),)
+    ).fetchone()
+    if row:
+        return row
+    cur = con.execute(
+        "INSERT INTO runs (path, prefix, stamp, ingested_at) VALUES (?, ?, ?, ?)",
+        (str(path), prefix, stamp, dt.datetime.now().isoformat(timespec="seconds")),
+    )
+    run_id = cur.lastrowid
+    con.execute(
+        "INSERT INTO files (path, prefix, run_id, offset, mtime_ns, state) VALUES (?, ?, ?, 0, 0, '')",
+        (str(path), prefix, run_id),
+    )
+    return run_id, 0, ""
+
+
+def reset_run(con: sqlite3.Connection, run_id: int) -> None:
+    for table in ("run_metrics", "run_items"):
+        con.execute(f"DELETE FROM {table} WHERE run_id=?", (run_id,))
+    con.execute("UPDATE files SET offset=0, state='' WHERE run_id=?", (run_id,))
+
+
+def ingest_file(
+    con: sqlite3.Connection, path: Path, settle_seconds: float
+) -> Dict[str, int]:
+    m = LOG_NAME_RE.match(path.name)
+    if m:
+        prefix, stamp, ext = m.group("prefix"), m.group("stamp"), m.group("ext")
+    else:
+        prefix, stamp, ext = path.stem, "", path.suffix.lstrip(".")
+    if ext == "md":
+        prefix = re.sub(r"_summary$", "", prefix)
+
+    st = path.stat()
+    run_id, offset, state = ensure_run(con, path, prefix, stamp)
+    if st.st_size < offset:
+        reset_run(con, run_id)
+        offset, state = 0, ""
+    if st.st_size == offset:
+        return {"bytes": 0, "records": 0}
+
+    with path.open("rb") as f:
+        f.seek(offset)
+        data = f.read(st.st_size - offset)
+    # Only complete lines, unless the writer has gone quiet (JS logs have no trailing newline).
+    settled = (time.time() - st.st_mtime) >= settle_seconds
+    if not settled:
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            return {"bytes": 0, "records": 0}
+        data = data[: cut + 1]
+
+    records = 0
+    metric_rows: List[tuple] = []
+    item_rows: List[tuple] = []
+    for raw in data.decode("utf-8", errors="replace").split("\n"):
+        if ext == "md":
+            rec = parse_md_line(raw)
+        else:
+            state, rec = parse_log_line(raw, state)
+        if rec is None:
+            continue
+        records += 1
+        if rec[0] == "metrics":
+            metric_rows.extend((run_id, k, num, text) for k, num, text in rec[1])
+        elif rec[0] == "item":
+            item_rows.append((run_id, *rec[1:]))
+
+    con.executemany(
+        "INSERT OR REPLACE INTO run_metrics (run_id, key, num, text) VALUES (?, ?, ?, ?)",
+        metric_rows,
+    )
+    con.executemany(
+        "INSERT INTO run_items (run_id, item_key, outcome, source, detail) VALUES (?, ?, ?, ?, ?)",
+        item_rows,
+    )
+    con.execute(
+        "UPDATE files SET offset=?, mtime_ns=?, state=? WHERE path=?",
+        (offset + len(data), st.st_mtime_ns, state, str(path)),
+    )
+    return {"bytes": len(data), "records": records}
+
+
+def ingest_dir(
+    con: sqlite3.Connection, log_dir: Path, store_path: Path, settle_seconds: float
+) -> Dict[str, int]:
+    totals = {"files_seen": 0, "files_updated": 0, "bytes": 0, "records": 0}
+    for path in sorted(log_dir.iterdir()):
+        if not path.is_file() or path.suffix not in (".log", ".md"):
+            continue
+        if path.resolve() == store_path.resolve():
+            continue
+        if path.suffix == ".md" and "_summary_" not in path.name:
+            continue
+        totals["files_seen"] += 1
+        with con:
+            r = ingest_file(con, path, settle_seconds)
+        if r["bytes"]:
+            totals["files_updated"] += 1
+            totals["bytes"] += r["bytes"]
+            totals["records"] += r["records"]
+    return totals
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank: the smallest value with at least pct% of samples at or below it.
+    idx = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def build_report(con: sqlite3.Connection) -> Tuple[List[dict], Dict[str, object]]:
+    metrics: Dict[int, Dict[str, float]] = defaultdict(dict)
+    for run_id, key, num in con.execute(
+        "SELECT run_id, key, num FROM run_metrics WHERE num IS NOT NULL"
+    ):
+        metrics[run_id][key] = num
+    items: Dict[int, int] = dict(
+        con.execute("SELECT run_id, COUNT(*) FROM run_items GROUP BY run_id")
+    )
+
+    run_rows: List[dict] = []
+    hit_matrix: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    provider_calls: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0.0, 0.0])
+    latency: Dict[str, List[float]] = defaultdict(list)
+
+    for run_id, prefix, stamp, path in con.execute(
+        "SELECT run_id, prefix, stamp, path FROM runs ORDER BY stamp, run_id"
+    ):
+        m = metrics.get(run_id, {})
+        processed = m.get("processed_total", m.get("checked"))
+        elapsed = m.get("timing.elapsed")
+        items_per_hour = ""
+        if processed and elapsed:
+            items_per_hour = round(processed / (elapsed / 3600.0), 1)
+        calls = sum(v for k, v in m.items() if k.startswith("provider_") and k.endswith(".calls"))
+        err429 = sum(v for k, v in m.items() if k.startswith("provider_") and k.endswith(".err429"))
+        if not calls:
+            # Older scripts only report `provider_<name>_429=` in the return block.
+            err429 = sum(v for k, v in m.items() if re.match(r"^provider_\w+_429$", k))
+        for k, v in m.items():
+            section, _, name = k.partition(".")
+            if section in ("provider_accept", "abstract", "s2_meta", "s2") and name:
+                hit_matrix[prefix][f"{section}.{name}"] += v
+            pm = re.match(r"^provider_(\w+)\.(calls|err429)$", k)
+            if pm:
+                provider_calls[(prefix, pm.group(1))][0 if pm.group(2) == "calls" else 1] += v
+        avg_ms = m.get("timing.avg_ms_per_item")
+        if avg_ms is not None:
+            latency[prefix].append(avg_ms)
+        run_rows.append(
+            {
+                "runID": run_id,
+                "prefix": prefix,
+                "stamp": stamp,
+                "processed": int(processed) if processed is not None else "",
+                "failed": int(m["failed"]) if "failed" in m else "",
+                "elapsedSeconds": int(elapsed) if elapsed is not None else "",
+                "itemsPerHour": items_per_hour,
+                "avgMsPerItem": int(avg_ms) if avg_ms is not None else "",
+                "providerCalls": int(calls),
+                "provider429": int(err429),
+                "rate429": round(err429 / calls, 4) if calls else "",
+                "itemLines": items.get(run_id, 0),
+                "path": path,
+            }
+        )
+
+    report = {
+        "runs": len(run_rows),
+        "hit_matrix": {p: dict(v) for p, v in hit_matrix.items()},
+        "rate_429": {
+            f"{p}/{prov}": {
+                "calls": int(c),
+                "err429": int(e),
+                "rate": round(e / c, 4) if c else None,
+            }
+            for (p, prov), (c, e) in sorted(provider_calls.items())
+        },
+        "latency_ms_per_item": {
+            p: {"runs": len(v), "p50": percentile(v, 50), "p95": percentile(v, 95)}
+            for p, v in sorted(latency.items())
+        },
+    }
+    return run_rows, report
+
+
+RUN_HEADERS = [
+    "runID",
+    "prefix",
+    "stamp",
+    "processed",
+    "failed",
+    "elapsedSeconds",
+    "itemsPerHour",
+    "avgMsPerItem",
+    "providerCalls",
+    "provider429",
+    "rate429",
+    "itemLines",
+    "path",
+]
+
+
+def write_csv(path: Path, rows: List[dict], headers: List[str]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=headers)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+
+
+def write_summary(
+    path: Path,
+    args: argparse.Namespace,
+    ingest: Optional[Dict[str, int]],
+    run_rows: List[dict],
+    report: Dict[str, object],
+    runs_csv: Path,
+) -> None:
+    lines = [
+        "# Run Log Metrics Report",
+        "",
+        f"- Time: {dt.datetime.now().isoformat(timespec='seconds')}",
+        f"- Log dir: `{args.log_dir}`",
+        f"- Store: `{args.store or '<log-dir>/log_metrics.sqlite'}`",
+        "",
+        "## Ingestion",
+        "",
+    ]
+    if ingest is None:
+        lines.append("- Skipped (`--report-only`)")
+    else:
+        lines += [
+            f"- Files seen: `{ingest['files_seen']}`",
+            f"- Files with new bytes: `{ingest['files_updated']}`",
+            f"- Bytes parsed: `{ingest['bytes']}`",
+            f"- Records stored: `{ingest['records']}`",
+        ]
+    lines += ["", "## Throughput", "", "| prefix | runs | items | hours | items/hour |", "|---|---|---|---|---|"]
+    by_prefix: Dict[str, List[dict]] = defaultdict(list)
+    for r in run_rows:
+        by_prefix[r["prefix"]].append(r)
+    for prefix, rows in sorted(by_prefix.items()):
+        n_items = sum(r["processed"] for r in rows if r["processed"] != "")
+        # Rate only over runs that logged timing (v3/v6 logs do not).
+        timed = [r for r in rows if r["processed"] != "" and r["elapsedSeconds"]]
+        hours = sum(r["elapsedSeconds"] for r in timed) / 3600.0
+        rate = f"{sum(r['processed'] for r in timed) / hours:.1f}" if hours else "-"
+        lines.append(f"| {prefix} | {len(rows)} | {n_items} | {hours:.2f} | {rate} |")
+
+    lines += ["", "## Per-Item Latency (run averages, ms)", "", "| prefix | runs | p50 | p95 |", "|---|---|---|---|"]
+    for prefix, v in report["latency_ms_per_item"].items():
+        lines.append(f"| {prefix} | {v['runs']} | {v['p50']:.0f} | {v['p95']:.0f} |")
+
+    lines += ["", "## 429 Rates", "", "| prefix/provider | calls | 429 | rate |", "|---|---|---|---|"]
+    for k, v in report["rate_429"].items():
+        rate = f"{v['rate']:.2%}" if v["rate"] is not None else "-"
+        lines.append(f"| {k} | {v['calls']} | {v['err429']} | {rate} |")
+
+    lines += ["", "## Provider Hit Matrix", ""]
+    for prefix, cells in sorted(report["hit_matrix"].items()):
+        joined = ", ".join(f"{k}={int(v)}" for k, v in sorted(cells.items()))
+        lines.append(f"- `{prefix}`: {joined}")
+
+    lines += ["", "## Log Files", "", f"- Runs: `{runs_csv}`"]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Ingest run logs into a SQLite metrics store and write throughput/429/latency reports."
+    )
+    p.add_argument(
+        "--log-dir", default=r"scripts\metadata-fixer\logs", help="Directory with run logs"
+    )
+    p.add_argument(
+        "--store", default="", help="Metrics SQLite path (default: <log-dir>/log_metrics.sqlite)"
+    )
+    p.add_argument("--report-only", action="store_true", help="Skip ingestion, only report")
+    p.add_argument(
+        "--follow",
+        type=float,
+        default=0,
+        help="Keep ingesting every N seconds instead of exiting",
+    )
+    p.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=5,
+        help="Treat a trailing line without newline as complete after this idle time",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    log_dir = Path(args.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    store_path = Path(args.store) if args.store else log_dir / "log_metrics.sqlite"
+
+    con = connect_store(store_path)
+    try:
+        ingest: Optional[Dict[str, int]] = None
+        if not args.report_only:
+            ingest = ingest_dir(con, log_dir, store_path, args.settle_seconds)
+            print(json.dumps(ingest, ensure_ascii=True))
+            while args.follow > 0:
+                try:
+                    time.sleep(args.follow)
+                except KeyboardInterrupt:
+                    break
+                r = ingest_dir(con, log_dir, store_path, args.settle_seconds)
+                if r["files_updated"]:
+                    print(json.dumps(r, ensure_ascii=True))
+                ingest["files_seen"] = r["files_seen"]
+                for k in ("files_updated", "bytes", "records"):
+                    ingest[k] += r[k]
+        run_rows, report = build_report(con)
+    finally:
+        con.close()
+
+    stamp = now_stamp()
+    runs_csv = log_dir / f"log_metrics_runs_{stamp}.csv"
+    summary_md = log_dir / f"log_metrics_report_{stamp}.md"
+    write_csv(runs_csv, run_rows, RUN_HEADERS)
+    write_summary(summary_md, args, ingest, run_rows, report, runs_csv)
+
+    print(f"summary={summary_md}")
+    print(f"runs={runs_csv}")
+    print(json.dumps({"runs": report["runs"], "rate_429": report["rate_429"]}, ensure_ascii=True))
+
+
+if __name__ == "__main__":
+    main()
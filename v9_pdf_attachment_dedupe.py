@@ -5,10 +5,36 @@ Detect and clean duplicate PDF attachments in a Zotero library.
 Modes:
 - dry-run (default): scan and write logs only
 - apply: delete exact duplicates and write deletion log
+- consolidate: plan hardlink/reflink consolidation of identical PDFs across
+  parents; with --apply, replace extra copies with links and write a journal.
+  --consolidate --apply only links files: nothing is deleted from zotero.sqlite
+- undo-consolidate: turn linked copies from a journal back into independent files
+- watch: long-running; flag new exact duplicates as attachments arrive (never deletes)
 
 Safety:
 - Only deletes attachments when parent item is the same AND file bytes (MD5) are identical.
 - Never deletes "suspicious" cases automatically.
+- Consolidation never touches itemAttachments rows or files outside storage,
+  and compares bytes again right before linking.
+
+Incremental:
+- --hash-index keeps MD5s keyed by (path, size, mtime) so unchanged files are
+  never re-hashed; --watch uses it by default.
+- --watch uses inotify on storage/ (Linux) for new/removed key folders and
+  polls zotero.sqlite by max itemID/dateModified; only affected parents are
+  re-analyzed. Existing folders are not watched individually (kernel watch
+  budget), their changes are picked up through dateModified.
+- A running Zotero keeps zotero.sqlite exclusively locked. Each --watch poll
+  first tries a normal read-only connection (1 s lock timeout) and, when the
+  database is locked, reads the immutable snapshot instead, as the one-shot
+  scans do. A snapshot read that hits a half-written page fails, is logged
+  and retried on the next tick; changes it misses are caught by a later poll.
+
+Memory:
+- --backend columnar keeps attachments in typed arrays with a packed 16-byte
+  MD5 and interned strings, groups exact duplicates by sorting (parent, digest)
+  (vectorized when NumPy is installed) and builds row dicts only for reported
+  groups. CSV output is identical to the default object backend.
 """
 
 from __future__ import annotations
@@ -16,15 +42,25 @@ from __future__ import annotations
 import argparse
 import csv
 import datetime as dt
+import filecmp
 import hashlib
 import json
 import os
+import select
 import shutil
 import sqlite3
+import struct
+import time
+from array import array
 from collections import Counter, defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the columnar backend falls back to sorted()
+    np = None
 
 
 @dataclass
@@ -57,8 +93,36 @@ def connect_db(db_path: Path, writable: bool) -> sqlite3.Connection:
     return sqlite3.connect(uri, uri=True, timeout=30)
 
 
-def fetch_pdf_attachments(con: sqlite3.Connection) -> List[Tuple]:
-    sql = """
+def connect_db_live(db_path: Path, timeout: float = 1.0) -> sqlite3.Connection:
+    # Read-only but not immutable: honours locks and the WAL. Running Zotero holds
+    # an exclusive lock, so callers must expect "database is locked".
+    uri = f"file:{db_path.as_posix()}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=timeout)
+
+
+def read_polled(
+    db_path: Path, read: Callable[[sqlite3.Connection], tuple]
+) -> Tuple[tuple, str]:
+    """
+    Run read(con) on a live read-only connection, or on the immutable snapshot
+    when Zotero holds its lock. Returns (result, "live" | "snapshot").
+    """
+    con = connect_db_live(db_path)
+    try:
+        return read(con), "live"
+    except sqlite3.OperationalError as e:
+        if "locked" not in str(e):
+            raise
+    finally:
+        con.close()
+    con = connect_db(db_path, writable=False)
+    try:
+        return read(con), "snapshot"
+    finally:
+        con.close()
+
+
+PDF_ATTACHMENTS_SQL = """
     SELECT
       ia.parentItemID,
       ia.itemID AS attItemID,
@@ -77,9 +141,82 @@ def fetch_pdf_attachments(con: sqlite3.Connection) -> List[Tuple]:
     LEFT JOIN itemDataValues at ON at.valueID = ida.valueID
     WHERE ia.parentItemID IS NOT NULL
       AND lower(COALESCE(ia.contentType, '')) = 'application/pdf'
+      {parent_filter}
     ORDER BY ia.parentItemID, ia.itemID
     """
-    return list(con.execute(sql))
+
+
+def iter_pdf_attachments(con: sqlite3.Connection) -> Iterator[Tuple]:
+    # Streams rows so the columnar backend never holds the full tuple list.
+    return con.execute(PDF_ATTACHMENTS_SQL.format(parent_filter=""))
+
+
+def fetch_pdf_attachments(
+    con: sqlite3.Connection, parent_ids: Optional[Iterable[int]] = None
+) -> List[Tuple]:
+    sql = PDF_ATTACHMENTS_SQL
+    if parent_ids is None:
+        return list(iter_pdf_attachments(con))
+    ids = sorted(set(parent_ids))
+    out: List[Tuple] = []
+    # Stay well under SQLITE_MAX_VARIABLE_NUMBER on older builds.
+    for i in range(0, len(ids), 500):
+        chunk = ids[i : i + 500]
+        marks = ",".join("?" * len(chunk))
+        out.extend(con.execute(sql.format(parent_filter=f"AND ia.parentItemID IN ({marks})"), chunk))
+    return sorted(out, key=lambda r: (r[0], r[1]))
+
+
+# (max itemID, max dateModified, (itemID, dateModified) pairs seen in that second)
+ChangeCursor = Tuple[int, str, FrozenSet[Tuple[int, str]]]
+
+
+def fetch_change_cursor(con: sqlite3.Connection) -> ChangeCursor:
+    row = con.execute("SELECT MAX(itemID), MAX(dateModified) FROM items").fetchone()
+    max_id, max_date = row[0] or 0, row[1] or ""
+    seen = con.execute("SELECT itemID, dateModified FROM items WHERE dateModified = ?", (max_date,))
+    return (max_id, max_date, frozenset(seen))
+
+
+def fetch_changed_parents(
+    con: sqlite3.Connection, cursor: ChangeCursor
+) -> Tuple[Set[int], ChangeCursor]:
+    """Parents of PDF attachments added or modified since cursor, and the new cursor."""
+    # dateModified has one-second resolution, so rows stamped in the cursor's own
+    # second are re-read (>=) and only those already seen then are dropped.
+    # The new cursor is taken first so nothing committed in between is skipped.
+    new_cursor = fetch_change_cursor(con)
+    max_id, max_date, seen = cursor
+    sql = """
+    SELECT ia.parentItemID, iAtt.itemID, iAtt.dateModified
+    FROM itemAttachments ia
+    JOIN items iAtt ON iAtt.itemID = ia.itemID
+    WHERE ia.parentItemID IS NOT NULL
+      AND lower(COALESCE(ia.contentType, '')) = 'application/pdf'
+      AND (iAtt.itemID > ? OR iAtt.dateModified >= ?)
+    """
+    parents = {
+        pid
+        for pid, item_id, modified in con.execute(sql, (max_id, max_date))
+        if item_id > max_id or (item_id, modified) not in seen
+    }
+    return parents, new_cursor
+
+
+def fetch_parents_for_keys(con: sqlite3.Connection, keys: Iterable[str]) -> Dict[str, int]:
+    keys = sorted(set(keys))
+    out: Dict[str, int] = {}
+    for i in range(0, len(keys), 500):
+        chunk = keys[i : i + 500]
+        marks = ",".join("?" * len(chunk))
+        sql = f"""
+        SELECT iAtt.key, ia.parentItemID
+        FROM itemAttachments ia
+        JOIN items iAtt ON iAtt.itemID = ia.itemID
+        WHERE ia.parentItemID IS NOT NULL AND iAtt.key IN ({marks})
+        """
+        out.update(dict(con.execute(sql, chunk)))
+    return out
 
 
 def norm_filename(name: str) -> str:
@@ -126,7 +263,55 @@ def hash_file(path: Path) -> Tuple[Optional[str], Optional[int], Optional[str]]:
         return None, None, str(e)
 
 
-def build_attachments(rows: Iterable[Tuple], storage_dir: Path) -> List[Attachment]:
+class HashIndex:
+    """Persistent MD5 cache keyed by path, reused while size and mtime are unchanged."""
+
+    def __init__(self, path: Path) -> None:
+        self.con = sqlite3.connect(str(path), timeout=30)
+        self.con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_hashes (
+              path TEXT PRIMARY KEY,
+              size INTEGER NOT NULL,
+              mtime_ns INTEGER NOT NULL,
+              md5 TEXT NOT NULL
+            )
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def hash(self, path: Path) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+        try:
+            st = path.stat()
+        except OSError as e:
+            return None, None, str(e)
+        row = self.con.execute(
+            "SELECT size, mtime_ns, md5 FROM file_hashes WHERE path=?", (str(path),)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            self.hits += 1
+            return row[2], row[0], None
+        self.misses += 1
+        md5, size, err = hash_file(path)
+        if md5:
+            self.con.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, md5) VALUES (?, ?, ?, ?)",
+                (str(path), size, st.st_mtime_ns, md5),
+            )
+        return md5, size, err
+
+    def commit(self) -> None:
+        self.con.commit()
+
+    def close(self) -> None:
+        self.con.commit()
+        self.con.close()
+
+
+def build_attachments(
+    rows: Iterable[Tuple], storage_dir: Path, index: Optional[HashIndex] = None
+) -> List[Attachment]:
     out: List[Attachment] = []
     for (
         parent_item_id,
@@ -142,7 +327,7 @@ def build_attachments(rows: Iterable[Tuple], storage_dir: Path) -> List[Attachme
         filename = fp.name if fp else None
         md5, size, hash_error = (None, None, "file_not_found")
         if fp:
-            md5, size, hash_error = hash_file(fp)
+            md5, size, hash_error = index.hash(fp) if index else hash_file(fp)
         out.append(
             Attachment(
                 parent_item_id=parent_item_id,
@@ -160,6 +345,8 @@ def build_attachments(rows: Iterable[Tuple], storage_dir: Path) -> List[Attachme
                 hash_error=hash_error,
             )
         )
+    if index:
+        index.commit()
     return out
 
 
@@ -295,6 +482,366 @@ def analyze(
     return exact_rows, suspicious_rows, delete_candidates, metrics
 
 
+class StringTable:
+    """Interned strings: each distinct value is stored once, rows keep an int index."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._ids: Optional[Dict[str, int]] = {}
+
+    def add(self, s: Optional[str]) -> int:
+        if s is None:
+            return -1
+        i = self._ids.get(s)
+        if i is None:
+            i = len(self.values)
+            self._ids[s] = i
+            self.values.append(s)
+        return i
+
+    def get(self, i: int) -> Optional[str]:
+        return None if i < 0 else self.values[i]
+
+    def freeze(self) -> None:
+        # Lookup dict is only needed while loading.
+        self._ids = None
+
+
+class AttachmentColumns:
+    """
+    Column store for attachments: typed parallel arrays, a packed 16-byte MD5
+    per row, and interned string tables. Rows become Attachment objects only
+    when they are reported.
+    """
+
+    STR_COLUMNS = (
+        "parent_key",
+        "parent_title",
+        "att_key",
+        "att_title",
+        "db_path",
+        "date_added",
+        "filename",
+        "norm_name",
+        "hash_error",
+    )
+
+    def __init__(self, storage_dir: Path) -> None:
+        self.storage_dir = storage_dir
+        self.parent_id = array("q")
+        self.att_id = array("q")
+        self.size = array("q")  # -1 when the file could not be hashed
+        self.digest = bytearray()
+        self.tables = {name: StringTable() for name in self.STR_COLUMNS}
+        self.refs = {name: array("l") for name in self.STR_COLUMNS}
+        # Only paths that differ from storage/<att_key>/<filename> are kept.
+        self.odd_paths: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.att_id)
+
+    def append(self, values: Dict[str, Optional[str]], parent_id: int, att_id: int,
+               file_path: Optional[Path], md5: Optional[str], size: Optional[int]) -> None:
+        row = len(self.att_id)
+        self.parent_id.append(parent_id)
+        self.att_id.append(att_id)
+        self.size.append(size if md5 and size is not None else -1)
+        self.digest += bytes.fromhex(md5) if md5 else bytes(16)
+        for name in self.STR_COLUMNS:
+            self.refs[name].append(self.tables[name].add(values.get(name)))
+        if file_path is not None and file_path != self.storage_dir / values["att_key"] / file_path.name:
+            self.odd_paths[row] = str(file_path)
+
+    def freeze(self) -> None:
+        for t in self.tables.values():
+            t.freeze()
+
+    def s(self, name: str, row: int) -> Optional[str]:
+        return self.tables[name].get(self.refs[name][row])
+
+    def md5(self, row: int) -> Optional[str]:
+        return self.digest[row * 16 : row * 16 + 16].hex() if self.size[row] >= 0 else None
+
+    def file_path(self, row: int) -> Optional[Path]:
+        path = self.file_path_str(row)
+        return Path(path) if path is not None else None
+
+    def file_path_str(self, row: int) -> Optional[str]:
+        # Same string as str(Path) without building a Path per reported row.
+        if row in self.odd_paths:
+            return self.odd_paths[row]
+        name = self.s("filename", row)
+        if name is None:
+            return None
+        return os.path.join(str(self.storage_dir), self.s("att_key", row), name)
+
+    def attachment(self, row: int) -> Attachment:
+        size = self.size[row]
+        return Attachment(
+            parent_item_id=self.parent_id[row],
+            parent_key=self.s("parent_key", row),
+            parent_title=self.s("parent_title", row),
+            att_item_id=self.att_id[row],
+            att_key=self.s("att_key", row),
+            att_title=self.s("att_title", row),
+            db_path=self.s("db_path", row),
+            date_added=self.s("date_added", row),
+            file_path=self.file_path(row),
+            filename=self.s("filename", row),
+            md5=self.md5(row),
+            size_bytes=size if size >= 0 else None,
+            hash_error=self.s("hash_error", row),
+        )
+
+    def attachments(self) -> List[Attachment]:
+        return [self.attachment(i) for i in range(len(self))]
+
+
+def build_columns(
+    rows: Iterable[Tuple], storage_dir: Path, index: Optional[HashIndex] = None
+) -> AttachmentColumns:
+    cols = AttachmentColumns(storage_dir)
+    for (
+        parent_item_id,
+        att_item_id,
+        db_path,
+        att_key,
+        date_added,
+        parent_key,
+        parent_title,
+        att_title,
+    ) in rows:
+        fp = resolve_file_path(storage_dir, att_key, db_path)
+        md5, size, hash_error = (None, None, "file_not_found")
+        if fp:
+            md5, size, hash_error = index.hash(fp) if index else hash_file(fp)
+        cols.append(
+            {
+                "parent_key": parent_key,
+                "parent_title": parent_title,
+                "att_key": att_key,
+                "att_title": att_title,
+                "db_path": db_path,
+                "date_added": date_added,
+                "filename": fp.name if fp else None,
+                "norm_name": norm_filename(fp.name) if fp else None,
+                "hash_error": hash_error,
+            },
+            parent_item_id,
+            att_item_id,
+            fp,
+            md5,
+            size,
+        )
+    if index:
+        index.commit()
+    cols.freeze()
+    return cols
+
+
+def _sorted_runs(rows: List[int], np_keys: list, py_key) -> List[List[int]]:
+    """Sort rows by key and return runs of equal keys with at least two rows."""
+    if not rows:
+        return []
+    if np is not None:
+        idx = np.asarray(rows, dtype=np.int64)
+        # lexsort treats the last key as primary.
+        order = idx[np.lexsort(tuple(k[idx] for k in reversed(np_keys)))]
+        diff = np.zeros(len(order) - 1, dtype=bool)
+        for k in np_keys:
+            sk = k[order]
+            diff |= sk[1:] != sk[:-1]
+        starts = np.flatnonzero(np.concatenate(([True], diff)))
+        ends = np.append(starts[1:], len(order))
+        keep = (ends - starts) >= 2
+        return [order[a:b].tolist() for a, b in zip(starts[keep], ends[keep])]
+    runs: List[List[int]] = []
+    prev = None
+    for i in sorted(rows, key=py_key):
+        k = py_key(i)
+        if runs and k == prev:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+            prev = k
+    return [r for r in runs if len(r) >= 2]
+
+
+def analyze_columns(
+    cols: AttachmentColumns,
+) -> Tuple[List[dict], List[dict], List[Attachment], Dict[str, int]]:
+    """Columnar equivalent of analyze(); produces the same rows in the same order."""
+    n = len(cols)
+    first_row: Dict[int, int] = {}
+    hashed_count: Dict[int, int] = defaultdict(int)
+    for i in range(n):
+        pid = cols.parent_id[i]
+        first_row.setdefault(pid, i)
+        if cols.size[i] >= 0:
+            hashed_count[pid] += 1
+
+    hashed = [i for i in range(n) if cols.size[i] >= 0]
+    named = [i for i in range(n) if cols.refs["filename"][i] >= 0]
+    if np is not None and n:
+        parent_np = np.frombuffer(cols.parent_id, dtype=np.int64)
+        digest_np = np.frombuffer(cols.digest, dtype=">u8").reshape(-1, 2)
+        name_np = np.frombuffer(cols.refs["norm_name"], dtype=np.dtype(cols.refs["norm_name"].typecode))
+        digest_keys = [parent_np, digest_np[:, 0], digest_np[:, 1]]
+        name_keys = [parent_np, name_np]
+    else:
+        digest_keys = name_keys = []
+
+    def digest_key(i: int) -> tuple:
+        return (cols.parent_id[i], bytes(cols.digest[i * 16 : i * 16 + 16]))
+
+    def name_key(i: int) -> tuple:
+        return (cols.parent_id[i], cols.refs["norm_name"][i])
+
+    dup_runs = _sorted_runs(hashed, digest_keys, digest_key)
+    name_runs = _sorted_runs(named, name_keys, name_key)
+
+    def detail(i: int) -> dict:
+        size = cols.size[i]
+        return {
+            "attItemID": cols.att_id[i],
+            "attKey": cols.s("att_key", i),
+            "filename": cols.s("filename", i),
+            "sizeBytes": size if size >= 0 else None,
+            "md5": cols.md5(i),
+        }
+
+    # Exact duplicates: same ordering as analyze() (parent first seen, then hash first seen).
+    exact_rows: List[dict] = []
+    delete_candidates: List[Attachment] = []
+    dup_parents: Set[int] = set()
+    for run in sorted(dup_runs, key=lambda r: (first_row[cols.parent_id[r[0]]], min(r))):
+        dup_parents.add(cols.parent_id[run[0]])
+        run = sorted(run, key=lambda i: (cols.s("date_added", i) or "", cols.att_id[i]))
+        keep = cols.att_id[run[0]]
+        h = cols.md5(run[0])
+        for idx, i in enumerate(run):
+            if idx > 0:
+                delete_candidates.append(cols.attachment(i))
+            fp = cols.file_path_str(i)
+            size = cols.size[i]
+            exact_rows.append(
+                {
+                    "parentItemID": cols.parent_id[i],
+                    "parentKey": cols.s("parent_key", i),
+                    "parentTitle": cols.s("parent_title", i),
+                    "md5": h,
+                    "attachmentItemID": cols.att_id[i],
+                    "attachmentKey": cols.s("att_key", i),
+                    "attachmentTitle": cols.s("att_title", i),
+                    "attachmentDBPath": cols.s("db_path", i),
+                    "resolvedFilePath": fp or "",
+                    "sizeBytes": size if size >= 0 else "",
+                    "dateAdded": cols.s("date_added", i),
+                    "action": "KEEP" if idx == 0 else "DELETE_CANDIDATE",
+                    "reason": f"same parent + identical bytes; keep={keep}",
+                }
+            )
+
+    # Suspicious rows, keyed (parent first seen, category, position) to match analyze().
+    keyed: List[Tuple[Tuple[int, int, int], dict]] = []
+    for i in range(n):
+        if cols.size[i] < 0 and cols.refs["hash_error"][i] >= 0:
+            pid = cols.parent_id[i]
+            keyed.append(
+                (
+                    (first_row[pid], 0, i),
+                    {
+                        "type": "MISSING_OR_UNHASHABLE_FILE",
+                        "parentItemID": pid,
+                        "parentKey": cols.s("parent_key", i),
+                        "parentTitle": cols.s("parent_title", i),
+                        "details": json.dumps(
+                            {
+                                "attItemID": cols.att_id[i],
+                                "attKey": cols.s("att_key", i),
+                                "dbPath": cols.s("db_path", i),
+                                "error": cols.s("hash_error", i),
+                            },
+                            ensure_ascii=True,
+                        ),
+                    },
+                )
+            )
+    for run in name_runs:
+        distinct = {cols.md5(i) for i in run if cols.size[i] >= 0}
+        if len(distinct) <= 1:
+            continue
+        head = min(run)
+        pid = cols.parent_id[head]
+        keyed.append(
+            (
+                (first_row[pid], 1, head),
+                {
+                    "type": "SAME_FILENAME_DIFFERENT_CONTENT",
+                    "parentItemID": pid,
+                    "parentKey": cols.s("parent_key", head),
+                    "parentTitle": cols.s("parent_title", head),
+                    "details": json.dumps(
+                        [detail(i) for i in sorted(run, key=lambda y: cols.att_id[y])],
+                        ensure_ascii=True,
+                    ),
+                },
+            )
+        )
+    multi = {pid for pid, c in hashed_count.items() if c >= 2 and pid not in dup_parents}
+    if multi:
+        members: Dict[int, List[int]] = defaultdict(list)
+        for i in range(n):
+            if cols.parent_id[i] in multi:
+                members[cols.parent_id[i]].append(i)
+        for pid, group in members.items():
+            head = group[0]
+            keyed.append(
+                (
+                    (first_row[pid], 2, head),
+                    {
+                        "type": "MULTIPLE_PDFS_DIFFERENT_CONTENT",
+                        "parentItemID": pid,
+                        "parentKey": cols.s("parent_key", head),
+                        "parentTitle": cols.s("parent_title", head),
+                        "details": json.dumps(
+                            [detail(i) for i in sorted(group, key=lambda y: cols.att_id[y])],
+                            ensure_ascii=True,
+                        ),
+                    },
+                )
+            )
+    keyed.sort(key=lambda x: x[0])
+    suspicious_rows = [r for _, r in keyed]
+
+    delete_candidates = sorted(delete_candidates, key=lambda x: x.att_item_id)
+    metrics = {
+        "pdf_attachments_total": n,
+        "parents_with_pdf": len(first_row),
+        "exact_duplicate_rows": len(exact_rows),
+        "exact_delete_candidates": len(delete_candidates),
+        "suspicious_rows": len(suspicious_rows),
+    }
+    return exact_rows, suspicious_rows, delete_candidates, metrics
+
+
+EXACT_HEADERS = [
+    "parentItemID",
+    "parentKey",
+    "parentTitle",
+    "md5",
+    "attachmentItemID",
+    "attachmentKey",
+    "attachmentTitle",
+    "attachmentDBPath",
+    "resolvedFilePath",
+    "sizeBytes",
+    "dateAdded",
+    "action",
+    "reason",
+]
+
+
 def write_csv(path: Path, rows: List[dict], headers: List[str]) -> None:
     with path.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=headers)
@@ -358,6 +905,425 @@ def delete_candidates_from_db(
     return results
 
 
+# Linux FICLONE ioctl (_IOW(0x94, 9, int)); supported by btrfs, XFS (reflink=1), bcachefs.
+FICLONE = 0x40049409
+
+CONSOLIDATE_HEADERS = [
+    "time",
+    "md5",
+    "sizeBytes",
+    "reclaimBytes",
+    "keepAttachmentItemID",
+    "keepAttachmentKey",
+    "keepPath",
+    "attachmentItemID",
+    "attachmentKey",
+    "parentItemID",
+    "targetPath",
+    "targetMtimeNs",
+    "targetInode",
+    "linkMode",
+    "status",
+    "error",
+]
+
+
+def is_under(path: Path, root: Path) -> bool:
+    try:
+        path.resolve().relative_to(root.resolve())
+        return True
+    except ValueError:
+        return False
+
+
+def plan_consolidation(
+    atts: List[Attachment], storage_dir: Path, delete_candidates: List[Attachment]
+) -> List[dict]:
+    """
+    Group byte-identical stored files across parents and plan one link per extra copy.
+
+    Exact same-parent duplicates are left to the delete path; linked files
+    outside storage are never touched.
+    """
+    skip_ids = {a.att_item_id for a in delete_candidates}
+    by_content: Dict[Tuple[str, int], List[Attachment]] = defaultdict(list)
+    for a in atts:
+        if not a.md5 or a.file_path is None or a.att_item_id in skip_ids:
+            continue
+        if not is_under(a.file_path, storage_dir):
+            continue
+        by_content[(a.md5, a.size_bytes or 0)].append(a)
+
+    plan: List[dict] = []
+    for (h, size), group in by_content.items():
+        if len({a.file_path for a in group}) < 2:
+            continue
+        group = sorted(group, key=lambda x: (x.date_added or "", x.att_item_id))
+        # Files can vanish between hashing and planning (Zotero sync, manual cleanup).
+        stats: Dict[int, os.stat_result] = {}
+        errors: Dict[int, str] = {}
+        for a in group:
+            try:
+                stats[a.att_item_id] = a.file_path.stat()
+            except OSError as e:
+                errors[a.att_item_id] = str(e)
+        present = [a for a in group if a.att_item_id in stats]
+        if not present:
+            continue
+        keep = present[0]
+        keep_stat = stats[keep.att_item_id]
+        group_rows: List[dict] = []
+        for a in group:
+            if a is keep:
+                continue
+            st = stats.get(a.att_item_id)
+            if st is None:
+                status = "SKIP_NOT_FOUND"
+            elif (st.st_dev, st.st_ino) == (keep_stat.st_dev, keep_stat.st_ino):
+                status = "ALREADY_LINKED"
+            elif st.st_dev != keep_stat.st_dev:
+                status = "SKIP_CROSS_DEVICE"
+            else:
+                status = "LINK_CANDIDATE"
+            group_rows.append(
+                {
+                    "time": "",
+                    "md5": h,
+                    "sizeBytes": size,
+                    "reclaimBytes": 0,
+                    "keepAttachmentItemID": keep.att_item_id,
+                    "keepAttachmentKey": keep.att_key,
+                    "keepPath": str(keep.file_path),
+                    "attachmentItemID": a.att_item_id,
+                    "attachmentKey": a.att_key,
+                    "parentItemID": a.parent_item_id,
+                    "targetPath": str(a.file_path),
+                    "targetMtimeNs": st.st_mtime_ns if st else "",
+                    "targetInode": f"{st.st_dev}:{st.st_ino}" if st else "",
+                    "linkMode": "",
+                    "status": status,
+                    "error": errors.get(a.att_item_id, ""),
+                }
+            )
+        # Targets sharing an inode free their blocks once, and only when no link
+        # to that inode is left outside this group.
+        by_inode: Dict[str, List[dict]] = defaultdict(list)
+        for r in group_rows:
+            if r["status"] == "LINK_CANDIDATE":
+                by_inode[r["targetInode"]].append(r)
+        for rows in by_inode.values():
+            if stats[rows[0]["attachmentItemID"]].st_nlink <= len(rows):
+                rows[0]["reclaimBytes"] = size
+        plan.extend(group_rows)
+    return sorted(plan, key=lambda r: (r["keepAttachmentItemID"], r["attachmentItemID"]))
+
+
+def try_reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - non-POSIX
+        return False
+    with src.open("rb") as fs, dst.open("wb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+            return True
+        except OSError:
+            pass
+    dst.unlink()
+    return False
+
+
+def link_file(src: Path, target: Path, link_mode: str) -> str:
+    """Atomically replace target with a reflink or hardlink of src; return the mode used."""
+    tmp = target.with_name(f".{target.name}.consolidate.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    used = ""
+    if link_mode in ("auto", "reflink") and try_reflink(src, tmp):
+        used = "reflink"
+    elif link_mode == "reflink":
+        raise OSError("reflink not supported on this filesystem")
+    else:
+        os.link(src, tmp)
+        used = "hardlink"
+    os.replace(tmp, target)
+    return used
+
+
+def apply_consolidation(plan: List[dict], link_mode: str, journal_path: Path) -> Dict[str, int]:
+    counts = {"linked": 0, "skipped": 0, "errors": 0, "reclaimed_bytes": 0}
+    # An inode's blocks are reclaimed only once every target pointing at it is linked.
+    inode_total: Counter = Counter()
+    inode_linked: Counter = Counter()
+    inode_reclaim: Dict[str, int] = defaultdict(int)
+    # Journal rows are flushed one by one so an interrupted run can still be undone.
+    with journal_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=CONSOLIDATE_HEADERS)
+        w.writeheader()
+        for r in plan:
+            r = dict(r, time=dt.datetime.now().isoformat(timespec="seconds"))
+            if r["status"] != "LINK_CANDIDATE":
+                counts["skipped"] += 1
+                w.writerow(r)
+                continue
+            keep = Path(r["keepPath"])
+            target = Path(r["targetPath"])
+            inode = (r["md5"], r["targetInode"])
+            inode_total[inode] += 1
+            inode_reclaim[inode] += int(r["reclaimBytes"])
+            try:
+                if not filecmp.cmp(keep, target, shallow=False):
+                    r["status"] = "SKIP_BYTES_CHANGED"
+                    counts["skipped"] += 1
+                else:
+                    r["linkMode"] = link_file(keep, target, link_mode)
+                    if r["linkMode"] == "reflink":
+                        # Reflinks keep their own inode, so the original mtime survives.
+                        mtime_ns = int(r["targetMtimeNs"])
+                        os.utime(target, ns=(mtime_ns, mtime_ns))
+                    r["status"] = "LINKED"
+                    counts["linked"] += 1
+                    inode_linked[inode] += 1
+            except Exception as e:
+                r["status"] = "ERROR"
+                r["error"] = str(e)
+                counts["errors"] += 1
+            w.writerow(r)
+            f.flush()
+    counts["reclaimed_bytes"] = sum(
+        b for inode, b in inode_reclaim.items() if inode_linked[inode] == inode_total[inode]
+    )
+    return counts
+
+
+def undo_consolidation(journal_path: Path, out_path: Path) -> Dict[str, int]:
+    """Replace every LINKED target from a journal with an independent copy."""
+    with journal_path.open("r", newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r["status"] == "LINKED"]
+    counts = {"restored": 0, "skipped": 0, "errors": 0}
+    with out_path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=CONSOLIDATE_HEADERS)
+        w.writeheader()
+        for r in rows:
+            r = dict(r, time=dt.datetime.now().isoformat(timespec="seconds"), error="")
+            target = Path(r["targetPath"])
+            tmp = target.with_name(f".{target.name}.unlink.tmp")
+            try:
+                if not target.is_file():
+                    r["status"] = "SKIP_NOT_FOUND"
+                    counts["skipped"] += 1
+                else:
+                    shutil.copyfile(target, tmp)
+                    mtime_ns = int(r["targetMtimeNs"])
+                    os.utime(tmp, ns=(mtime_ns, mtime_ns))
+                    os.replace(tmp, target)
+                    r["status"] = "RESTORED"
+                    counts["restored"] += 1
+            except Exception as e:
+                if tmp.exists():
+                    tmp.unlink()
+                r["status"] = "ERROR"
+                r["error"] = str(e)
+                counts["errors"] += 1
+            w.writerow(r)
+            f.flush()
+    return counts
+
+
+class InotifyWatcher:
+    """Minimal ctypes inotify reader that maps storage events to attachment keys (Linux only)."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+    FOLDER_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self, storage_dir: Path) -> None:
+        import ctypes
+        import ctypes.util
+
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.storage_dir = storage_dir
+        self.wd_key: Dict[int, str] = {}
+        self.root_wd = self._add(storage_dir, self.ROOT_MASK)
+
+    @classmethod
+    def create(cls, storage_dir: Path) -> Optional["InotifyWatcher"]:
+        try:
+            return cls(storage_dir)
+        except (OSError, AttributeError):
+            return None
+
+    def _add(self, path: Path, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            raise OSError(self._ctypes.get_errno(), f"inotify_add_watch failed: {path}")
+        return wd
+
+    def watch_folder(self, key: str) -> None:
+        try:
+            self.wd_key[self._add(self.storage_dir / key, self.FOLDER_MASK)] = key
+        except OSError:
+            # Folder vanished or watch limit reached; DB polling still covers it.
+            pass
+
+    def read_keys(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        keys: Set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            off = 0
+            while off + 16 <= len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, off)
+                name = data[off + 16 : off + 16 + length].split(b"\0", 1)[0].decode(
+                    "utf-8", errors="replace"
+                )
+                off += 16 + length
+                if wd == self.root_wd:
+                    if not name:
+                        continue
+                    keys.add(name)
+                    if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        self.watch_folder(name)
+                elif mask & self.IN_IGNORED:
+                    self.wd_key.pop(wd, None)
+                elif wd in self.wd_key:
+                    keys.add(self.wd_key[wd])
+        return keys
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+WATCH_HEADERS = ["detectedAt"] + EXACT_HEADERS
+
+
+def run_watch(
+    db_path: Path,
+    storage_dir: Path,
+    watch_csv: Path,
+    index: HashIndex,
+    poll_seconds: float,
+    pending_ttl_seconds: float = 600,
+) -> None:
+    """Keep the dedupe state live and append newly found exact duplicates to watch_csv."""
+    con = connect_db(db_path, writable=False)
+    try:
+        rows = fetch_pdf_attachments(con)
+        cursor = fetch_change_cursor(con)
+    finally:
+        con.close()
+    atts = build_attachments(rows, storage_dir, index)
+    _, _, delete_candidates, metrics = analyze(atts)
+
+    known: Dict[int, Set[int]] = defaultdict(set)
+    for a in delete_candidates:
+        known[a.parent_item_id].add(a.att_item_id)
+    key_parent = {a.att_key: a.parent_item_id for a in atts}
+    del atts, rows
+
+    watcher = InotifyWatcher.create(storage_dir)
+    print(json.dumps(metrics, ensure_ascii=True))
+    print(f"[watch] inotify={'on' if watcher else 'off (polling only)'} poll_seconds={poll_seconds}")
+    print(f"watch={watch_csv}")
+
+    # Storage keys seen on disk but not yet in the DB (Zotero writes the folder first).
+    pending: Dict[str, float] = {}
+    with watch_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=WATCH_HEADERS)
+        w.writeheader()
+        f.flush()
+        # Keys touched on disk whose evaluation failed; retried with the next tick.
+        retry_keys: Set[str] = set()
+        try:
+            while True:
+                if watcher:
+                    touched = watcher.read_keys(poll_seconds)
+                else:
+                    time.sleep(poll_seconds)
+                    touched = set()
+                touched |= retry_keys
+                started = time.monotonic()
+                now = time.time()
+                for k in touched:
+                    pending.setdefault(k, now)
+
+                def read_changes(con: sqlite3.Connection) -> tuple:
+                    changed, new_cursor = fetch_changed_parents(con, cursor)
+                    resolved = fetch_parents_for_keys(con, pending) if pending else {}
+                    changed |= {key_parent[k] for k in touched if k in key_parent}
+                    changed |= set(resolved.values())
+                    rows = fetch_pdf_attachments(con, changed) if changed else []
+                    return changed, new_cursor, resolved, rows
+
+                # A half-written DB or a storage hiccup must not end the watch:
+                # log it, keep cursor/pending as they were and retry next tick.
+                try:
+                    (affected, new_cursor, resolved, rows), source = read_polled(
+                        db_path, read_changes
+                    )
+
+                    hits, misses = index.hits, index.misses
+                    sub = build_attachments(rows, storage_dir, index) if affected else []
+                except (sqlite3.DatabaseError, OSError) as e:
+                    retry_keys = touched
+                    stamp = dt.datetime.now().isoformat(timespec="seconds")
+                    print(f"[watch] {stamp} error={type(e).__name__}: {e}; retrying next poll")
+                    continue
+                retry_keys = set()
+                cursor = new_cursor
+                for k in list(pending):
+                    if k in resolved or now - pending[k] > pending_ttl_seconds:
+                        del pending[k]
+                if not affected:
+                    continue
+
+                exact_rows, _, sub_candidates, _ = analyze(sub)
+                fresh: Dict[int, Set[int]] = defaultdict(set)
+                for a in sub_candidates:
+                    fresh[a.parent_item_id].add(a.att_item_id)
+                for a in sub:
+                    key_parent[a.att_key] = a.parent_item_id
+
+                flagged: Set[int] = set()
+                for parent_id in affected:
+                    if fresh[parent_id] - known[parent_id]:
+                        flagged.add(parent_id)
+                    known[parent_id] = fresh[parent_id]
+                stamp = dt.datetime.now().isoformat(timespec="seconds")
+                for r in exact_rows:
+                    if r["parentItemID"] in flagged:
+                        w.writerow(dict(r, detectedAt=stamp))
+                f.flush()
+                elapsed_ms = int((time.monotonic() - started) * 1000)
+                print(
+                    f"[watch] {stamp} parents={len(affected)} attachments={len(sub)} "
+                    f"hashed={index.misses - misses} cached={index.hits - hits} "
+                    f"new_duplicate_parents={len(flagged)} db={source} eval_ms={elapsed_ms}"
+                )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if watcher:
+                watcher.close()
+
+
 def write_summary(
     summary_path: Path,
     metrics: Dict[str, int],
@@ -365,6 +1331,7 @@ def write_summary(
     suspicious_csv: Path,
     deleted_csv: Optional[Path],
     args: argparse.Namespace,
+    consolidate_csv: Optional[Path] = None,
 ) -> None:
     lines = [
         "# PDF Attachment Dedup Report",
@@ -381,6 +1348,22 @@ def write_summary(
         f"- Exact duplicate rows: `{metrics['exact_duplicate_rows']}`",
         f"- Exact duplicate delete candidates: `{metrics['exact_delete_candidates']}`",
         f"- Suspicious rows: `{metrics['suspicious_rows']}`",
+    ]
+    if "consolidate_link_candidates" in metrics:
+        lines += [
+            f"- Consolidation link candidates: `{metrics['consolidate_link_candidates']}`",
+            f"- Consolidation already linked: `{metrics['consolidate_already_linked']}`",
+            f"- Consolidation files missing since hashing: `{metrics['consolidate_missing_files']}`",
+            f"- Consolidation reclaimable bytes: `{metrics['consolidate_reclaimable_bytes']}`",
+        ]
+    if "consolidate_linked" in metrics:
+        lines += [
+            f"- Consolidation linked: `{metrics['consolidate_linked']}`",
+            f"- Consolidation skipped: `{metrics['consolidate_skipped']}`",
+            f"- Consolidation errors: `{metrics['consolidate_errors']}`",
+            f"- Consolidation reclaimed bytes: `{metrics['consolidate_reclaimed_bytes']}`",
+        ]
+    lines += [
         "",
         "## Log Files",
         "",
@@ -389,6 +1372,9 @@ def write_summary(
     ]
     if deleted_csv:
         lines.append(f"- Deletion log: `{deleted_csv}`")
+    if consolidate_csv:
+        label = "Consolidation journal" if args.apply else "Consolidation plan"
+        lines.append(f"- {label}: `{consolidate_csv}`")
     summary_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
@@ -414,9 +1400,53 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--apply",
         action="store_true",
-        help="Delete exact duplicate attachment items and write deletion log",
+        help="Delete exact duplicate attachment items and write deletion log (with --consolidate: link only)",
+    )
+    parser.add_argument(
+        "--consolidate",
+        action="store_true",
+        help=(
+            "Plan linking of identical PDFs across parents; with --apply, link them and "
+            "write a journal (exact duplicates are then not deleted)"
+        ),
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=["auto", "reflink", "hardlink"],
+        default="auto",
+        help="Consolidation link type; auto tries reflink first and falls back to hardlink",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["objects", "columnar"],
+        default="objects",
+        help="In-memory layout for analysis; columnar uses far less memory on large libraries",
+    )
+    parser.add_argument(
+        "--hash-index",
+        default="",
+        help="SQLite cache of file MD5s; unchanged files (same size/mtime) are not re-hashed",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Run continuously and log new exact duplicates as files arrive (Ctrl+C to stop)",
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=5,
+        help="Watch mode: how often to poll zotero.sqlite for new or modified attachments",
+    )
+    parser.add_argument(
+        "--undo-consolidate",
+        default="",
+        help="Path to a consolidation journal CSV; restore independent copies and exit",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.watch and (args.apply or args.consolidate):
+        parser.error("--watch only flags duplicates; run --apply/--consolidate separately")
+    return args
 
 
 def main() -> None:
@@ -431,43 +1461,64 @@ def main() -> None:
     suspicious_csv = log_dir / f"pdf_dedupe_suspicious_{stamp}.csv"
     deleted_csv = log_dir / f"pdf_dedupe_deleted_{stamp}.csv"
     summary_md = log_dir / f"pdf_dedupe_summary_{stamp}.md"
+    consolidate_csv = log_dir / f"pdf_dedupe_consolidate_{stamp}.csv"
+
+    if args.undo_consolidate:
+        undo_csv = log_dir / f"pdf_dedupe_consolidate_undo_{stamp}.csv"
+        counts = undo_consolidation(Path(args.undo_consolidate), undo_csv)
+        print(f"undo={undo_csv}")
+        print(json.dumps(counts, ensure_ascii=True))
+        return
+
+    index: Optional[HashIndex] = None
+    if args.hash_index:
+        index = HashIndex(Path(args.hash_index))
+    elif args.watch:
+        index = HashIndex(log_dir / "pdf_dedupe_hash_index.sqlite")
+
+    if args.watch:
+        try:
+            run_watch(
+                db_path,
+                storage_dir,
+                log_dir / f"pdf_dedupe_watch_{stamp}.csv",
+                index,
+                args.poll_seconds,
+            )
+        finally:
+            index.close()
+        return
 
     con = connect_db(db_path, writable=False)
     try:
-        rows = fetch_pdf_attachments(con)
+        if args.backend == "columnar":
+            cols = build_columns(iter_pdf_attachments(con), storage_dir, index)
+        else:
+            rows = fetch_pdf_attachments(con)
     finally:
         con.close()
 
-    atts = build_attachments(rows, storage_dir)
-    exact_rows, suspicious_rows, delete_candidates, metrics = analyze(atts)
+    if args.backend == "columnar":
+        exact_rows, suspicious_rows, delete_candidates, metrics = analyze_columns(cols)
+        # Consolidation needs per-file paths, so materialize only in that mode.
+        atts = cols.attachments() if args.consolidate else []
+    else:
+        atts = build_attachments(rows, storage_dir, index)
+        exact_rows, suspicious_rows, delete_candidates, metrics = analyze(atts)
+    if index:
+        index.close()
 
-    write_csv(
-        exact_csv,
-        exact_rows,
-        [
-            "parentItemID",
-            "parentKey",
-            "parentTitle",
-            "md5",
-            "attachmentItemID",
-            "attachmentKey",
-            "attachmentTitle",
-            "attachmentDBPath",
-            "resolvedFilePath",
-            "sizeBytes",
-            "dateAdded",
-            "action",
-            "reason",
-        ],
-    )
+    write_csv(exact_csv, exact_rows, EXACT_HEADERS)
     write_csv(
         suspicious_csv,
         suspicious_rows,
         ["type", "parentItemID", "parentKey", "parentTitle", "details"],
     )
 
+    # With --consolidate, --apply confirms linking only; deletion stays a separate run.
+    apply_delete = args.apply and not args.consolidate
     deleted_log_path: Optional[Path] = None
-    if args.apply and delete_candidates:
+    if apply_delete and delete_candidates:
         del_rows = delete_candidates_from_db(db_path, storage_dir, delete_candidates)
         write_csv(
             deleted_csv,
@@ -482,7 +1533,7 @@ def main() -> None:
             ],
         )
         deleted_log_path = deleted_csv
-    elif args.apply:
+    elif apply_delete:
         write_csv(
             deleted_csv,
             [],
@@ -497,13 +1548,43 @@ def main() -> None:
         )
         deleted_log_path = deleted_csv
 
-    write_summary(summary_md, metrics, exact_csv, suspicious_csv, deleted_log_path, args)
+    consolidate_log_path: Optional[Path] = None
+    if args.consolidate:
+        plan = plan_consolidation(atts, storage_dir, delete_candidates)
+        candidates = [r for r in plan if r["status"] == "LINK_CANDIDATE"]
+        metrics["consolidate_link_candidates"] = len(candidates)
+        metrics["consolidate_already_linked"] = sum(
+            1 for r in plan if r["status"] == "ALREADY_LINKED"
+        )
+        metrics["consolidate_missing_files"] = sum(
+            1 for r in plan if r["status"] == "SKIP_NOT_FOUND"
+        )
+        metrics["consolidate_reclaimable_bytes"] = sum(r["reclaimBytes"] for r in candidates)
+        if args.apply:
+            counts = apply_consolidation(plan, args.link_mode, consolidate_csv)
+            for k, v in counts.items():
+                metrics[f"consolidate_{k}"] = v
+        else:
+            write_csv(consolidate_csv, plan, CONSOLIDATE_HEADERS)
+        consolidate_log_path = consolidate_csv
+
+    write_summary(
+        summary_md,
+        metrics,
+        exact_csv,
+        suspicious_csv,
+        deleted_log_path,
+        args,
+        consolidate_log_path,
+    )
 
     print(f"summary={summary_md}")
     print(f"exact={exact_csv}")
     print(f"suspicious={suspicious_csv}")
     if deleted_log_path:
         print(f"deleted={deleted_log_path}")
+    if consolidate_log_path:
+        print(f"consolidate={consolidate_log_path}")
     print(json.dumps(metrics, ensure_ascii=True))
 
 